@@ -26,12 +26,16 @@
 # -----------------------------------------------------------------------------
 
 import io
+import bisect
 import toml
 import requests
 import logging
 import json
+import re
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import List, Optional
 
 from os import environ
 
@@ -40,13 +44,97 @@ from hermes_python.hermes import Hermes
 from hermes_python.ontology import *
 from geopy.geocoders import Nominatim
 
+try:
+    import orjson as _json         # SIMD-accelerated, decodes bytes directly
+except ImportError:
+    import json as _json
+
+try:
+    import simdjson                # lazy SIMD parser, only materializes accessed fields
+except ImportError:
+    simdjson = None
+
+try:
+    import ahocorasick             # multi-keyword matching in one pass
+except ImportError:
+    ahocorasick = None
+
+try:
+    import msgspec                 # typed decoding, skips all unreferenced fields
+except ImportError:
+    msgspec = None
+
+try:
+    import numpy as np             # C-level min/max over the temperature vectors
+except ImportError:
+    np = None
+
+# -----------------------------------------------------------------------------
+# dark sky response schema (msgspec)
+# -----------------------------------------------------------------------------
+# only the fields actually read downstream are declared; dict-style access is
+# provided so the processing code handles structs and plain dicts alike
+
+if msgspec:
+    class WxStruct(msgspec.Struct):
+        def __getitem__(self, key):
+            value = getattr(self, key)
+
+            if value is None:
+                raise KeyError(key)
+
+            return value
+
+        def __contains__(self, key):
+            return getattr(self, key, None) is not None
+
+        def get(self, key, default = None):
+            value = getattr(self, key, None)
+
+            return default if value is None else value
+
+    class WxHour(WxStruct):
+        time: int
+        summary: str
+        icon: str
+        temperature: float
+        precipType: Optional[str] = None
+        precipProbability: Optional[float] = None
+
+    class WxDay(WxStruct):
+        time: int
+        summary: str
+        icon: str
+        temperatureMin: float
+        temperatureMax: float
+
+    class WxHourly(WxStruct):
+        data: List[WxHour]
+
+    class WxDaily(WxStruct):
+        data: List[WxDay]
+
+    class WxForecast(WxStruct):
+        currently: WxHour
+        hourly: WxHourly
+        daily: WxDaily
+
+    _forecast_decoder = msgspec.json.Decoder(WxForecast)
+else:
+    _forecast_decoder = None
+
 # -----------------------------------------------------------------------------
 # global definitions (home assistant service URLs)
 # -----------------------------------------------------------------------------
 
 FORECAST_URL = "https://api.darksky.net/forecast/"
+GEO_CACHE_FILE = "geo_cache.json"
 APP_ID = "snips-skill-s710-wetter"
 
+# ascii-fold table for the time slot, so all keyword checks stay pure ascii
+
+FOLD_TABLE = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
 # -----------------------------------------------------------------------------
 # class App
 # -----------------------------------------------------------------------------
@@ -60,6 +148,20 @@ class App(object):
 
         self.logger = logging.getLogger(APP_ID)
         self.geolocator = Nominatim(user_agent = APP_ID)
+        self._use_simdjson = bool(simdjson and not msgspec)
+
+        # persistent geocode cache, avoids the nominatim round-trip for known cities
+
+        self._geo_cache = {}
+        self._fc_cache = {}
+
+        try:
+            with io.open(GEO_CACHE_FILE, encoding = 'utf-8') as f:
+                self._geo_cache = json.load(f)
+        except IOError:
+            pass
+        except Exception as e:
+            self.logger.warning("Failed to read %s (%s)", GEO_CACHE_FILE, e)
 
         # parameters
 
@@ -70,9 +172,38 @@ class App(object):
         self.api_key = None
         self.home_location = None
         self.weekdays = ['montag', 'dienstag', 'mittwoch', 'donnerstag', 'freitag', 'samstag', 'sonntag']
-        self.day_range_symbols = ['früh', 'vormittag', 'mittag', 'nachmittag', 'abend', 'nacht']
+        self.day_range_symbols = ['frueh', 'vormittag', 'mittag', 'nachmittag', 'abend', 'nacht']
+
+        self.known_intents = frozenset({'s710:getForecast','s710:getTemperature','s710:hasRain','s710:hasSun','s710:hasSnow'})
+
+        # handler + optional precip/sun argument per intent
+
+        self._dispatch = {
+            's710:getForecast': (self.process_forecast, None),
+            's710:getTemperature': (self.process_temperature, None),
+            's710:hasRain': (self.process_has, 'rain'),
+            's710:hasSun': (self.process_has, 'sun'),
+            's710:hasSnow': (self.process_has, 'snow'),
+        }
+
+        # all keywords looked for in the time slot, matched in a single pass
 
-        self.known_intents = ['s710:getForecast','s710:getTemperature','s710:hasRain','s710:hasSun','s710:hasSnow']
+        self._time_keywords = self.weekdays + self.day_range_symbols + ['wochenende', 'woche', 'ende', 'heute', 'morgen', 'bermorgen', 'naechste']
+
+        if ahocorasick:
+            self._kw_automaton = ahocorasick.Automaton()
+
+            for keyword in self._time_keywords:
+                self._kw_automaton.add_word(keyword, keyword)
+
+            self._kw_automaton.make_automaton()
+            self._kw_regex = None
+        else:
+            # single precompiled alternation, longest keywords first so e.g.
+            # 'wochenende' wins over 'woche' and 'vormittag' over 'mittag'
+
+            self._kw_automaton = None
+            self._kw_regex = re.compile('|'.join(map(re.escape, sorted(self._time_keywords, key = len, reverse = True))))
 
         homecity = None
         
@@ -81,29 +212,44 @@ class App(object):
         try:
             self.config = SnipsConfigParser.read_configuration_file("config.ini")
         except Exception as e:
-            self.logger.error("Failed to read config.ini ({})".format(e))
+            self.logger.error("Failed to read config.ini (%s)", e)
             self.config = None
 
         try:
             self.read_toml()
         except Exception as e:
-            self.logger.error("Failed to read /etc/snips.toml ({})".format(e))
+            self.logger.error("Failed to read /etc/snips.toml (%s)", e)
 
         if 'api_key' in self.config['secret']:
             self.api_key = self.config['secret']['api_key']
 
+        self._forecast_prefix = f"{FORECAST_URL}{self.api_key}/"
+
         if 'homecity' in self.config['global']:
             homecity = self.config['global']['homecity']
 
         self.http_headers = { 'Accept-Encoding': 'deflate, gzip' }
 
-        self.logger.debug("Debug: Connecting to {}@{} ...".format(self.mqtt_user, self.mqtt_host))
+        # one keep-alive session for all forecast requests, so the TLS
+        # handshake to dark sky is not repeated per intent
+
+        self._session = requests.Session()
+        self._session.headers.update(self.http_headers)
+        self._session.params = { 'units': 'si', 'lang': 'de', 'exclude': 'flags,alerts,minutely', 'extend': 'hourly' }
+        self._session.mount('https://', requests.adapters.HTTPAdapter(pool_connections = 4, pool_maxsize = 4))
+
+        self.logger.debug("Debug: Connecting to %s@%s ...", self.mqtt_user, self.mqtt_host)
 
         try:
-            loc = self.geolocator.geocode(homecity)
-            self.home_location = (loc.latitude, loc.longitude)
+            self.home_location = self._geocode(homecity)
         except Exception as e:
-            self.logger.error("Error: Failed to determine homecity coordinates for '{}' ({})".format(homecity, e))
+            self.logger.error("Error: Failed to determine homecity coordinates for '%s' (%s)", homecity, e)
+
+        # warm up the dark sky connection and prime the forecast cache for the
+        # home location while the MQTT connection is being established
+
+        if self.home_location:
+            threading.Thread(target = self._fetch_forecast, args = (self.home_location,), daemon = True).start()
 
         self.start()
 
@@ -142,7 +288,7 @@ class App(object):
             if len(intent_message.slots):
                 if len(intent_message.slots.time):
                     time = intent_message.slots.time.first().value
-                    time = time.lower()
+                    time = time.lower().translate(FOLD_TABLE)
                 if len(intent_message.slots.location):
                     city = intent_message.slots.location.first().value
         except:
@@ -153,74 +299,133 @@ class App(object):
         if intent_message.intent.intent_name not in self.known_intents:
             return
 
-        self.logger.debug("Intent {} with city {} and time {}".format(intent_message.intent.intent_name, city if city else '-', time if time else '-'))
+        self.logger.debug("Intent %s with city %s and time %s", intent_message.intent.intent_name, city if city else '-', time if time else '-')
 
         try:
             self.query_weather(hermes, intent_message, intent_message.intent.intent_name, city, time)
         except Exception as e:
-            self.logger.error("Failed to query weather ({})".format(e))
+            self.logger.error("Failed to query weather (%s)", e)
 
     # -------------------------------------------------------------------------
     # query_weather
 
     def query_weather(self, hermes, intent_message, intent_name, city, time):
 
-        # get corresponding home assistant service-url + payload
+        # resolve the forecast location (city slot or homecity)
+
+        location = self.get_location(city)
+
+        if not location:
+            self.logger.error("Failed to determine forecast URL/parameters, cannot query weather")
+            return None
+
+        response_content = self._fetch_forecast(location)
+
+        if response_content is None:
+            return None
 
         try:
-            req_url = self.get_request_url(city, self.home_location)
+            response_message = self.process_response(hermes, intent_name, response_content, time)
         except Exception as e:
-            self.logger.error("Failed to execute location HTTP request ({})".format(e))
+            self.logger.error("Failed to parse response content from dark sky (%s)", e)
             return None
 
-        if not req_url:
-            self.logger.error("Failed to determine forecast URL/parameters, cannot query weather")
-            return None
+        self.done(hermes, intent_message, response_message)
+
+    # -------------------------------------------------------------------------
+    # _fetch_forecast
+
+    def _fetch_forecast(self, location):
+
+        # forecasts are cached per location and 10-minute bucket, so repeated
+        # intents skip both the HTTP request and the JSON decode
+
+        key = (round(location[0], 3), round(location[1], 3), int(time.time() // 600))
+
+        if key in self._fc_cache:
+            return self._fc_cache[key]
+
+        # drop entries from earlier buckets before fetching, so a failed
+        # fetch/decode cannot leave stale forecasts pinned in the cache
+
+        self._fc_cache = { k: v for k, v in self._fc_cache.items() if k[2] == key[2] }
+
+        req_url = self.get_request_url(location)
 
-        self.logger.debug("Debug: Querying URL [{}]".format(req_url.replace(self.api_key, "API_KEY")))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Debug: Querying URL [%s]", req_url.replace(self.api_key, "API_KEY"))
 
         try:
-            req = requests.get(req_url, headers = self.http_headers, params = { 'units': 'si', 'lang': 'de', 'exclude': 'flags,alerts,minutely', 'extend': 'hourly' })
+            req = self._session.get(req_url)
         except Exception as e:
-            self.logger.error("Failed to execute weather HTTP request ({})".format(e))
+            self.logger.error("Failed to execute weather HTTP request (%s)", e)
             return None
 
         if req.status_code != 200:
-            self.logger.error("Failed to query dark sky forecast (HTTP {} / {})".format(req.status_code, req.content.decode('utf-8')[:80] if req.content else "-"))
+            self.logger.error("Failed to query dark sky forecast (HTTP %s / %s)", req.status_code, req.content.decode('utf-8')[:80] if req.content else "-")
             return None
 
         try:
-            response_content = json.loads(req.content.decode('utf-8'))
+            if _forecast_decoder is not None:
+                response_content = _forecast_decoder.decode(req.content)
+            elif self._use_simdjson:
+                # fresh parser per fetch: the cached document keeps its own
+                # parser alive, while reusing a shared one would fail as long
+                # as proxies of the previous document are still referenced
+
+                response_content = simdjson.Parser().parse(req.content)
+            else:
+                response_content = _json.loads(req.content)
         except Exception as e:
-            self.logger.error("Failed to parse response content from dark sky ({})".format(e))
+            self.logger.error("Failed to parse response content from dark sky (%s)", e)
             return None
 
+        self._fc_cache[key] = response_content
+
+        return response_content
+
+    # -------------------------------------------------------------------------
+    # get_location
+
+    def get_location(self, city = None):
+        if city is None:
+            return self.home_location
+
         try:
-            response_message = self.process_response(hermes, intent_name, response_content, time)
+            return self._geocode(city)
         except Exception as e:
-            self.logger.error("Failed to parse response content from dark sky ({})".format(e))
+            self.logger.error("Failed to query coordinates for city '%s' (%s)", city, e)
             return None
 
-        self.done(hermes, intent_message, response_message)
-
     # -------------------------------------------------------------------------
-    # get_request_url
+    # _geocode
 
-    def get_request_url(self, city = None, coordinates = None):
-        location = coordinates
+    def _geocode(self, city):
+        key = city.strip().lower()
 
-        if city is not None:
-            try:
-                loc = self.geolocator.geocode(city)
-                location = (loc.latitude, loc.longitude)
-            except Exception as e:
-                self.logger.error("Failed to query coordinates for city '{}' ({})".format(city, e))
-                return None
+        if key in self._geo_cache:
+            return tuple(self._geo_cache[key])
 
-        if not location:
-            return None
+        loc = self.geolocator.geocode(city)
+        location = (loc.latitude, loc.longitude)
 
-        return FORECAST_URL + self.api_key + "/" + str(location[0]) + "," + str(location[1])
+        self._geo_cache[key] = location
+        self._save_geo_cache()
+
+        return location
+
+    def _save_geo_cache(self):
+        try:
+            with open(GEO_CACHE_FILE, 'w') as f:
+                json.dump(self._geo_cache, f)
+        except Exception as e:
+            self.logger.warning("Failed to write %s (%s)", GEO_CACHE_FILE, e)
+
+    # -------------------------------------------------------------------------
+    # get_request_url
+
+    def get_request_url(self, location):
+        return f"{self._forecast_prefix}{location[0]},{location[1]}"
 
     # -------------------------------------------------------------------------
     # process_response
@@ -230,28 +435,37 @@ class App(object):
         weather = self.select_weather(response_content, scale, tme_from, tme_to)
 
         if not weather or not weather[0] or (scale == 'daily' and not weather[1]):
-            self.logger.warning('Failed to get weather info for requested range ({} - {})'.format(tme_from, tme_to))
+            self.logger.warning('Failed to get weather info for requested range (%s - %s)', tme_from, tme_to)
             return None
 
-        self.logger.debug("Check weather with scale {} and prefix {}".format(scale, prefix))
+        self.logger.debug("Check weather with scale %s and prefix %s", scale, prefix)
 
-        if intent_name == 's710:getForecast':
-            return self.process_forecast(hermes, intent_name, response_content, scale, weather, prefix)
+        dispatch = self._dispatch.get(intent_name)
 
-        if intent_name == 's710:getTemperature':
-            return self.process_temperature(hermes, intent_name, response_content, scale, weather, prefix)
+        if not dispatch:
+            self.logger.error("Intent %s/parameters not recognized, ignoring", intent_name)
+            return None
 
-        if intent_name == 's710:hasRain':
-            return self.process_has(hermes, intent_name, 'rain', response_content, scale, weather, prefix)
+        handler, what = dispatch
 
-        if intent_name == 's710:hasSun':
-            return self.process_has(hermes, intent_name, 'sun', response_content, scale, weather, prefix)
+        if what is not None:
+            return handler(hermes, intent_name, what, response_content, scale, weather, prefix)
 
-        if intent_name == 's710:hasSnow':
-            return self.process_has(hermes, intent_name, 'snow', response_content, scale, weather, prefix)
+        return handler(hermes, intent_name, response_content, scale, weather, prefix)
 
-        self.logger.error("Intent {}/parameters not recognized, ignoring".format(intent_name))
-        return None
+    # -------------------------------------------------------------------------
+    # _temp_range
+
+    def _temp_range(self, entries, key_min, key_max = None):
+        key_max = key_max or key_min
+
+        if np is not None:
+            lo = np.fromiter((w[key_min] for w in entries), dtype = np.float64, count = len(entries)).min()
+            hi = np.fromiter((w[key_max] for w in entries), dtype = np.float64, count = len(entries)).max()
+
+            return float(lo), float(hi)
+
+        return min(w[key_min] for w in entries), max(w[key_max] for w in entries)
 
     # -------------------------------------------------------------------------
     # process_forecast
@@ -270,61 +484,74 @@ class App(object):
 
         def get_wx_on(what, data):
             if len(data) == 1:
-                return ' Vermutlich ' + what + ' am ' + data[0] + '.'
+                return f' Vermutlich {what} am {data[0]}.'
 
-            return ' Vermutlich ' + what + ' am ' + ', '.join(data[:-1]) + ' und ' + data[-1] + '.' if data else ''
+            return f" Vermutlich {what} am {', '.join(data[:-1])} und {data[-1]}." if data else ''
 
         if scale == 'currently':
-            return 'Das Wetter ist aktuell ' + get_summary(weather_hours_and_days[0]) + ' Temperatur liegt bei ' + str(round(weather_hours_and_days[0]['temperature'])) + ' Grad.'
+            current = weather_hours_and_days[0]
+
+            return f"Das Wetter ist aktuell {get_summary(current)} Temperatur liegt bei {round(current['temperature'])} Grad."
 
         elif scale == 'daily':
             days = weather_hours_and_days[1]
-            temps_max = [w['temperatureMax'] for w in days]
-            temps_min = [w['temperatureMin'] for w in days]
+            t_lo, t_hi = self._temp_range(days, 'temperatureMin', 'temperatureMax')
 
             if len(days) == 1:
-                return 'Wetter ' + prefix + ': ' + get_summary(days[0]) + ' Temperaturen zwischen ' + str(round(days[0]['temperatureMin'])) + ' und ' + str(round(days[0]['temperatureMax'])) + ' Grad.'
+                return f"Wetter {prefix}: {get_summary(days[0])} Temperaturen zwischen {round(days[0]['temperatureMin'])} und {round(days[0]['temperatureMax'])} Grad."
 
             if len(days) == 2:
                 day1 = datetime.fromtimestamp(days[0]['time']).weekday()
                 day2 = datetime.fromtimestamp(days[1]['time']).weekday()
 
                 if days[0]['summary'] == days[1]['summary']:
-                    res1 = 'Wetter am ' + self.weekdays[day1].capitalize() + ' und ' + self.weekdays[day2].capitalize() + ': ' + get_summary(days[0]) + ' '
+                    res1 = f"Wetter am {self.weekdays[day1].capitalize()} und {self.weekdays[day2].capitalize()}: {get_summary(days[0])} "
                     res2 = ''
-                    resTemp = ' Die Temperaturen liegen zwischen ' + str(round(min(temps_min))) + ' und ' + str(round(max(temps_max))) +  ' Grad.'
                 else:
-                    res1 = 'Wetter am ' + self.weekdays[day1].capitalize() + ': ' + get_summary(days[0]) + ' '
-                    res2 = self.weekdays[day2].capitalize() + ' ' + get_summary(days[1])
-                    resTemp = ' Die Temperaturen liegen zwischen ' + str(round(min(temps_min))) + ' und ' + str(round(max(temps_max))) +  ' Grad.'
+                    res1 = f"Wetter am {self.weekdays[day1].capitalize()}: {get_summary(days[0])} "
+                    res2 = f"{self.weekdays[day2].capitalize()} {get_summary(days[1])}"
+
+                resTemp = f" Die Temperaturen liegen zwischen {round(t_lo)} und {round(t_hi)} Grad."
 
                 return res1 + res2 + resTemp
 
             # more than 2 multiple days ('diese Woche', 'nächste Woche')
 
-            day1 = self.weekdays[datetime.fromtimestamp(days[0]['time']).weekday()].capitalize()
+            day_names = [self.weekdays[datetime.fromtimestamp(w['time']).weekday()].capitalize() for w in days]
+            first_t = days[0]['time']
+
+            rain_days, snow_days, thunder_days = [], [], []
+
+            for i, w in enumerate(days):
+                if w['time'] == first_t:
+                    continue
 
-            rain_days = [self.weekdays[datetime.fromtimestamp(w['time']).weekday()].capitalize() for w in days if w['icon'] == 'rain' and w['time'] != days[0]['time']]
-            snow_days = [self.weekdays[datetime.fromtimestamp(w['time']).weekday()].capitalize() for w in days if w['icon'] == 'snow' and w['time'] != days[0]['time']]
-            thunder_days = [self.weekdays[datetime.fromtimestamp(w['time']).weekday()].capitalize() for w in days if w['icon'] == 'thunderstorm' and w['time'] != days[0]['time']]
+                icon = w['icon']
+
+                if icon == 'rain':
+                    rain_days.append(day_names[i])
+                elif icon == 'snow':
+                    snow_days.append(day_names[i])
+                elif icon == 'thunderstorm':
+                    thunder_days.append(day_names[i])
 
             rain_on =  get_wx_on('Regen', rain_days)
             snow_on = get_wx_on('Schnee', snow_days)
             thunder_on = get_wx_on('Gewitter', thunder_days)
 
-            res1 = 'Wetter am ' + day1 + ': ' + get_summary(days[0]) 
-            temp = ' Temperaturen zwischen ' + str(round(min(temps_min))) + ' und ' + str(round(max(temps_max))) + ' Grad.'
+            res1 = f"Wetter am {day_names[0]}: {get_summary(days[0])}"
+            temp = f" Temperaturen zwischen {round(t_lo)} und {round(t_hi)} Grad."
 
             return res1 + rain_on + snow_on + thunder_on + temp
         else:
             hours = weather_hours_and_days[0]
-            temps = [w['temperature'] for w in hours]
+            t_lo, t_hi = self._temp_range(hours, 'temperature')
 
             if hours[0]['summary'] == hours[-1]['summary']:
-                return 'Wetter ' + prefix + ': ' + get_summary(hours[0]) + ' Temperaturen zwischen ' + str(round(min(temps))) + ' und ' + str(round(max(temps))) + ' Grad.'
+                return f"Wetter {prefix}: {get_summary(hours[0])} Temperaturen zwischen {round(t_lo)} und {round(t_hi)} Grad."
+
+            return f"Wetter {prefix}: {get_summary(hours[0], True)} bis {get_summary(hours[-1])} Temperaturen zwischen {round(t_lo)} und {round(t_hi)} Grad."
 
-            return 'Wetter ' + prefix + ': ' + get_summary(hours[0], True) + ' bis ' + get_summary(hours[-1]) + ' Temperaturen zwischen ' + str(round(min(temps))) + ' und ' + str(round(max(temps))) + ' Grad.'
-            
         return None
 
     # -------------------------------------------------------------------------
@@ -334,17 +561,17 @@ class App(object):
         weather = weather_hours_and_days[0]
 
         if scale == 'currently' and 'temperature' in weather:
-            return 'Es sind gerade ' + str(round(weather['temperature'])) + ' Grad.'
-        
+            return f"Es sind gerade {round(weather['temperature'])} Grad."
+
         else:
             weather = weather_hours_and_days[0]
 
             if len(weather) == 1:
-                return prefix + ' wird es etwa ' + str(round(weather[0]['temperature'])) + ' Grad warm.'
+                return f"{prefix} wird es etwa {round(weather[0]['temperature'])} Grad warm."
 
-            temps = [w['temperature'] for w in weather]
+            t_lo, t_hi = self._temp_range(weather, 'temperature')
 
-            return prefix + ' wird es zwischen ' + str(round(min(temps))) + ' und ' + str(round(max(temps))) +  ' Grad warm.'
+            return f"{prefix} wird es zwischen {round(t_lo)} und {round(t_hi)} Grad warm."
 
         return None
 
@@ -357,21 +584,25 @@ class App(object):
 
         if scale == 'currently':
             if what == 'sun':
-                if 'icon' in weather and weather['icon'] == 'clear-day':
+                icon = weather.get('icon', '')
+
+                if icon == 'clear-day':
                     return 'Ja, es ist gerade sonnig.'
 
-                if 'icon' in weather and 'cloudy' in weather['icon']:
-                    return 'Nein, ist ist gerade ' + ('eher ' if weather['icon'] is not 'cloudy' else '') + 'bewölkt.'
+                if 'cloudy' in icon:
+                    return f"Nein, ist ist gerade {'eher ' if icon != 'cloudy' else ''}bewölkt."
 
                 return 'Nein, ich denke nicht.'
             else:
-                if 'precipType' not in weather or weather['precipType'] is not what or 'precipProbability' not in weather or weather['precipProbability'] < 0.3:
-                    return 'Ich denke nicht, dass es gerade ' + ('regnet.' if what == 'rain' else 'schneit.')
-            
-                if weather['precipProbability'] < 0.75:
-                    return 'Ja, es ' + ('regnet gerade' if what == 'rain' else 'schneit gerade') + ' vermutlich.'
+                prob = weather.get('precipProbability', 0.0)
+
+                if weather.get('precipType') != what or prob < 0.3:
+                    return f"Ich denke nicht, dass es gerade {'regnet.' if what == 'rain' else 'schneit.'}"
 
-                return 'Ja, es ' + ('regnet gerade.' if what == 'rain' else 'schneit gerade.')
+                if prob < 0.75:
+                    return f"Ja, es {'regnet gerade' if what == 'rain' else 'schneit gerade'} vermutlich."
+
+                return f"Ja, es {'regnet gerade.' if what == 'rain' else 'schneit gerade.'}"
         else:
             if what == 'sun':
                 hasSun = [w for w in weather if w['icon'] == 'clear-day']
@@ -385,16 +616,27 @@ class App(object):
                 day = self.weekdays[dt.weekday()]
                 when = dt.strftime("%H:%M Uhr")
 
+                sun_text = 'sonnig.' if hasSun else 'ein bisschen Sonne geben.'
+
                 if scale == 'hourly':
-                    return 'Gegen ' + when + ' wird es ' + ('sonnig.' if hasSun else ('ein bisschen Sonne geben.'))
+                    return f"Gegen {when} wird es {sun_text}"
                 elif len(weather_days) == 1:
-                    return prefix + ' wird es gegen ' + when + ' ' + ('sonnig.' if hasSun else ('ein bisschen Sonne geben.'))
+                    return f"{prefix} wird es gegen {when} {sun_text}"
 
-                return 'Am ' + day.capitalize() + ' wird es gegen ' + when + ' ' + ('sonnig.' if hasSun else ('ein bisschen Sonne geben.'))
+                return f"Am {day.capitalize()} wird es gegen {when} {sun_text}"
             else:
-                hasRain = [w for w in weather if w['icon'] == 'rain' or ('precipType' in w and w['precipType'] == what and 'precipProbability' in w and w['precipProbability'] > 0.3)]
-                hasHail = [w for w in weather if w['icon'] == 'hail' or ('precipType' in w and w['precipType'] == what and 'precipProbability' in w and w['precipProbability'] > 0.3)]
-                hasThunder = [w for w in weather if w['icon'] == 'thunderstorm' or ('precipType' in w and w['precipType'] == what and 'precipProbability' in w and w['precipProbability'] > 0.3)]
+                hasRain, hasHail, hasThunder = [], [], []
+
+                for w in weather:
+                    icon = w['icon']
+                    has_precip = w.get('precipType') == what and w.get('precipProbability', 0.0) > 0.3
+
+                    if icon == 'rain' or has_precip:
+                        hasRain.append(w)
+                    if icon == 'hail' or has_precip:
+                        hasHail.append(w)
+                    if icon == 'thunderstorm' or has_precip:
+                        hasThunder.append(w)
 
                 if not hasRain and not hasHail and not hasThunder:
                     return 'Nein, ich denke nicht.'
@@ -404,19 +646,22 @@ class App(object):
                 day = self.weekdays[dt.weekday()]
                 prob = ''
                 when = dt.strftime("%H:%M Uhr")
+                precip_prob = w.get('precipProbability', 0.0)
 
-                if w['precipProbability'] < 0.3:
+                if precip_prob < 0.3:
                     return 'Nein, ich denke nicht.'
 
-                if w['precipProbability'] < 0.75:
+                if precip_prob < 0.75:
                     prob = ' vermutlich'
 
+                precip_text = 'regnen.' if hasRain else ('hageln.' if hasHail else 'Gewitter geben.')
+
                 if scale == 'hourly':
-                    return 'Gegen ' + when + ' wird es ' + ('regnen.' if hasRain else ('hageln.' if hasHail else 'Gewitter geben.'))
+                    return f"Gegen {when} wird es {precip_text}"
                 elif len(weather_days) == 1:
-                    return prefix + ' wird es ' + ('regnen.' if hasRain else ('hageln.' if hasHail else 'Gewitter geben.'))
+                    return f"{prefix} wird es {precip_text}"
 
-                return 'Am ' + day.capitalize() + ' wird es' + prob + ' gegen ' + when + ' ' + ('regnen.' if hasRain else ('hageln.' if hasHail else 'Gewitter geben.'))
+                return f"Am {day.capitalize()} wird es{prob} gegen {when} {precip_text}"
 
         return None
 
@@ -427,20 +672,48 @@ class App(object):
         res = None
 
         try:
+            # with the lazy simdjson parser, entries are proxies; materialize
+            # python dicts only for the entries which pass the time filter
+
+            as_dict = (lambda entry: entry.as_dict()) if self._use_simdjson else (lambda entry: entry)
+
             if scale == 'currently':
-                return (weather['currently'], None)
+                return (as_dict(weather['currently']), None)
+
+            # dark sky returns hourly/daily entries sorted by time, so the
+            # range filter is a binary search + slice instead of a full scan
 
-            hours = [hour for hour in weather['hourly']['data'] if hour['time'] >= tme_from and hour['time'] <= tme_to]
-            days = [day for day in weather['daily']['data'] if day['time'] >= tme_from and day['time'] <= tme_to]
+            hours = [as_dict(hour) for hour in self.slice_timerange(weather['hourly']['data'], tme_from, tme_to)]
+            days = [as_dict(day) for day in self.slice_timerange(weather['daily']['data'], tme_from, tme_to)]
 
             return (hours, days)
 
         except Exception as e:
-            self.logger.error('Failed to parse response contents ({})'.format(e))
+            self.logger.error('Failed to parse response contents (%s)', e)
             return None
 
         return res
 
+    # -------------------------------------------------------------------------
+    # _collect_time_tokens
+
+    def _collect_time_tokens(self, time_string):
+        if self._kw_automaton is not None:
+            return {keyword for _, keyword in self._kw_automaton.iter(time_string)}
+
+        return set(self._kw_regex.findall(time_string))
+
+    # -------------------------------------------------------------------------
+    # slice_timerange
+
+    def slice_timerange(self, entries, tme_from, tme_to):
+        times = [entry['time'] for entry in entries]
+
+        lo = bisect.bisect_left(times, tme_from)
+        hi = bisect.bisect_right(times, tme_to)
+
+        return [entries[i] for i in range(lo, hi)]
+
     # -------------------------------------------------------------------------
     # get_timerange
 
@@ -448,22 +721,24 @@ class App(object):
         if not time_string:
             return ('currently', None, None, 'Jetzt')
 
+        tokens = self._collect_time_tokens(time_string)
+
         # single weekdays
 
-        contained_weekdays = [day for day in self.weekdays if day in time_string]
-        contained_day_range_symbols = [sym for sym in self.day_range_symbols if sym in time_string]
+        contained_weekdays = [day for day in self.weekdays if day in tokens]
+        contained_day_range_symbols = [sym for sym in self.day_range_symbols if sym in tokens]
 
         if contained_weekdays:
             return self.get_weekday(self.weekdays.index(contained_weekdays[0]))
 
         # week-ends (sat+sun)
 
-        if 'wochenende' in time_string or ('woche' in time_string and 'ende' in time_string):
+        if 'wochenende' in tokens or ('woche' in tokens and 'ende' in tokens):
             return self.get_weekend_range()
 
         # whole week
 
-        if 'woche' in time_string:
+        if 'woche' in tokens:
             return self.get_week_range(time_string)
 
         # whole day for specific day
@@ -492,15 +767,23 @@ class App(object):
 
     # -------------------------------------------------------------------------
     # timerange helpers
-    
+
+    def _midnight_epoch(self, epoch):
+
+        # resolved via mktime instead of subtracting the time of day, which
+        # would be off by an hour on DST transition days
+
+        lt = time.localtime(epoch)
+
+        return int(time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1)))
+
     def get_day_range(self, epoch, prefix):
-        dt1 = datetime.fromtimestamp(epoch).replace(minute = 0, hour = 0, second = 0, microsecond= 0)
-        dt2 = datetime.fromtimestamp(epoch).replace(minute = 59, hour = 23, second = 59, microsecond= 0)
+        midnight = self._midnight_epoch(epoch)
 
-        return ('daily', dt1.timestamp(), dt2.timestamp(), prefix)
+        return ('daily', midnight, midnight + 24 * 60 * 60 - 1, prefix)
 
     def get_subrange(self, time_string, epoch, prefix):
-        if 'früh' in time_string:
+        if 'frueh' in time_string:
             return self.get_hour_range(epoch, 6, 10, prefix + ' früh')
 
         if 'vormittag' in time_string:
@@ -519,50 +802,50 @@ class App(object):
             return self.get_hour_range(epoch, 22, -1, prefix + ' nacht')
 
     def get_hour_range(self, epoch, hours_from, hours_to, prefix):
-        dt1 = datetime.fromtimestamp(epoch).replace(minute = 0, hour = hours_from, second = 0, microsecond= 0)
-        dt2 = dt1
+        midnight = self._midnight_epoch(epoch)
+        ts1 = midnight + hours_from * 3600
 
         if hours_to == -1: # nasty, i know -> next day 3:00
-            dt2 = datetime.fromtimestamp(epoch + 1 * 24 * 60 * 60).replace(minute = 0, hour = 3, second = 0, microsecond= 0)
+            ts2 = self._midnight_epoch(epoch + 1 * 24 * 60 * 60) + 3 * 3600
         else:
-            dt2 = datetime.fromtimestamp(epoch).replace(minute = 0, hour = hours_to, second = 0, microsecond= 0)
+            ts2 = midnight + hours_to * 3600
 
-        return ('hourly', dt1.timestamp(), dt2.timestamp(), prefix)
+        return ('hourly', ts1, ts2, prefix)
 
     def get_weekend_range(self):
-        dt = datetime.fromtimestamp(time.time()).replace(minute = 0, hour = 0, second = 0, microsecond = 0)
-        offset = 5 - dt.weekday()
+        now = time.time()
+        midnight = self._midnight_epoch(now)
+        offset = 5 - time.localtime(now).tm_wday
 
-        dt1 = dt + timedelta(days = offset)
-        dt2 = dt1 + timedelta(days = 1)
+        ts1 = midnight + offset * 24 * 60 * 60
+        ts2 = ts1 + 24 * 60 * 60
 
-        return ('daily', dt1.timestamp(), dt2.timestamp(), "Am Wochenende")
+        return ('daily', ts1, ts2, "Am Wochenende")
 
     def get_week_range(self, time_string):
-        dt = datetime.fromtimestamp(time.time()).replace(minute = 0, hour = 0, second = 0, microsecond = 0)
-
-        monday = dt + timedelta(days = 0 - dt.weekday())
-        sunday = monday + timedelta(days = 6)
+        now = time.time()
+        midnight = self._midnight_epoch(now)
 
-        if 'nächste' in time_string:
-            dt1 = monday + timedelta(days = 7)
-            dt2 = sunday + timedelta(days = 7)
+        monday = midnight - time.localtime(now).tm_wday * 24 * 60 * 60
+        sunday = monday + 6 * 24 * 60 * 60
 
-            return ('daily', dt1.timestamp(), dt2.timestamp(), "Nächste Woche")
+        if 'naechste' in time_string:
+            return ('daily', monday + 7 * 24 * 60 * 60, sunday + 7 * 24 * 60 * 60, "Nächste Woche")
 
-        return ('daily', monday.timestamp(), sunday.timestamp(), "Diese Woche")
+        return ('daily', monday, sunday, "Diese Woche")
 
     def get_weekday(self, day):
-        dt1 = datetime.fromtimestamp(time.time()).replace(minute = 0, hour = 0, second = 0, microsecond = 0)
-        offset = day - dt1.weekday()
+        now = time.time()
+        midnight = self._midnight_epoch(now)
+        offset = day - time.localtime(now).tm_wday
 
         if offset <= 0:
             offset = offset + 7
 
-        dt1 = dt1 + timedelta(days = offset)
-        dt2 = dt1.replace(minute = 59, hour = 23, second = 59, microsecond = 0)
+        ts1 = midnight + offset * 24 * 60 * 60
+        ts2 = ts1 + 24 * 60 * 60 - 1
 
-        return ('daily', dt1.timestamp(), dt2.timestamp(), "am " + self.weekdays[day].capitalize())
+        return ('daily', ts1, ts2, "am " + self.weekdays[day].capitalize())
 
     # -------------------------------------------------------------------------
     # done